@@ -3,49 +3,75 @@ Launches napari with some nice sample data for testing the gui
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Tuple
 import sys
 
 import napari
 import numpy as np
-from skimage.filters import gaussian
-from skimage.morphology import ball
 
-temp_path = Path("/tmp/napari-3d-counter")
-temp_path.mkdir(exist_ok=True)
-os.chdir(temp_path)
+
+@lru_cache
+def ball_mask(radius: int) -> np.ndarray:
+    """
+    returns a boolean ball, computed once per radius
+    """
+    span = slice(-radius, radius + 1)
+    zz, yy, xx = np.ogrid[span, span, span]
+    return zz * zz + yy * yy + xx * xx <= radius * radius
 
 
 def place_ball(
     image: np.ndarray, position: Tuple[int, int, int], radius=5
 ) -> np.ndarray:
-    ball_z, ball_x, ball_y = np.where(ball(radius))
-    image[ball_z + position[0], ball_x + position[1], ball_y + position[2]] = 1
+    mask = ball_mask(radius)
+    diameter = mask.shape[0]
+    z, x, y = position
+    image[z : z + diameter, x : x + diameter, y : y + diameter][mask] = 1
     return image
 
 
-viewer = napari.viewer.Viewer()
-image = np.zeros(shape=(30, 200, 200))
-image = place_ball(image, (12, 100, 30))
-image = place_ball(image, (7, 150, 100))
-image = place_ball(image, (10, 20, 20))
-image = gaussian(image, sigma=1)
-viewer.add_image(image, colormap="green", name="Cell 1", blending="additive")
-image = np.zeros(shape=(30, 200, 200))
-image = place_ball(image, (8, 60, 35))
-image = place_ball(image, (13, 150, 150))
-image = gaussian(image, sigma=1)
-viewer.add_image(image, colormap="magenta", name="Cell 2", blending="additive")
-
-if len(sys.argv) == 2:
-    from napari_3d_counter import Count3D, CellTypeConfig
-
-    viewer.window.add_dock_widget(
-        Count3D(viewer, [CellTypeConfig("Counter 1")])
+def main():
+    """
+    adds the sample images to a new viewer and runs napari
+    """
+    # scipy is only needed to blur the sample images
+    from scipy.ndimage import gaussian_filter
+
+    temp_path = Path("/tmp/napari-3d-counter")
+    temp_path.mkdir(exist_ok=True)
+    os.chdir(temp_path)
+    viewer = napari.viewer.Viewer()
+    image = np.zeros(shape=(30, 200, 200), dtype=np.float32)
+    image = place_ball(image, (12, 100, 30))
+    image = place_ball(image, (7, 150, 100))
+    image = place_ball(image, (10, 20, 20))
+    gaussian_filter(image, sigma=1, mode="nearest", output=image)
+    viewer.add_image(
+        image, colormap="green", name="Cell 1", blending="additive"
     )
+    image = np.zeros(shape=(30, 200, 200), dtype=np.float32)
+    image = place_ball(image, (8, 60, 35))
+    image = place_ball(image, (13, 150, 150))
+    gaussian_filter(image, sigma=1, mode="nearest", output=image)
+    viewer.add_image(
+        image, colormap="magenta", name="Cell 2", blending="additive"
+    )
+
+    if len(sys.argv) == 2:
+        from napari_3d_counter import Count3D, CellTypeConfig
+
+        viewer.window.add_dock_widget(
+            Count3D(viewer, [CellTypeConfig("Counter 1")])
+        )
+
+    napari.run()
+
+
+if __name__ == "__main__":
+    main()
 
-napari.run()
 # start wiget
 # add green cells
 # add magenta cells
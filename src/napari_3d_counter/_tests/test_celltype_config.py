@@ -23,7 +23,9 @@ def test_fewer_colors():
 
 
 def test_more_colors():
-    ctc = [cc.CellTypeConfig()] * (len(cc.DEFAULT_COLOR_SEQUENCE) + 1)
+    ctc = [
+        cc.CellTypeConfig() for _ in range(len(cc.DEFAULT_COLOR_SEQUENCE) + 1)
+    ]
     out = cc.process_cell_type_config(ctc)
     assert [c.color for c in out] == cc.DEFAULT_COLOR_SEQUENCE + [
         cc.DEFAULT_COLOR_SEQUENCE[-1]
@@ -101,52 +103,22 @@ def viewer(make_napari_viewer):
     return make_napari_viewer()
 
 
-def test_seting_name(viewer):
-    test_feat = "test_name"
-    ctc = [cc.CellTypeConfig(name=test_feat)]
-    widget = Count3D(viewer, ctc)
-    layer = widget.cell_type_gui_and_data[0].layer
-    assert layer.name == test_feat
-
-
-def test_seting_color(viewer):
-    test_feat = "#12345678"
-    ctc = [cc.CellTypeConfig(color=test_feat)]
-    widget = Count3D(viewer, ctc)
-    layer = widget.cell_type_gui_and_data[0].layer
-    assert layer.current_border_color == test_feat
-
-
-def test_seting_outline_size(viewer):
-    test_feat = 100
-    ctc = [cc.CellTypeConfig(outline_size=test_feat)]
-    widget = Count3D(viewer, ctc)
-    layer = widget.cell_type_gui_and_data[0].layer
-    assert layer.current_size == test_feat
-
-
-def test_seting_face_color(viewer):
-    test_feat = "#12345678"
-    ctc = [cc.CellTypeConfig(face_color=test_feat)]
-    widget = Count3D(viewer, ctc)
-    layer = widget.cell_type_gui_and_data[0].layer
-    assert layer.current_face_color == test_feat
-
-
-def test_seting_symbol(viewer):
-    test_feat = "x"
-    ctc = [cc.CellTypeConfig(symbol=test_feat)]
-    widget = Count3D(viewer, ctc)
-    layer = widget.cell_type_gui_and_data[0].layer
-    assert layer.current_symbol == test_feat
-
-
-def test_seting_edge_width(viewer):
-    test_feat = 0.8
-    ctc = [cc.CellTypeConfig(edge_width=test_feat)]
+@pytest.mark.parametrize(
+    "config_attr, layer_attr, test_feat",
+    [
+        ("name", "name", "test_name"),
+        ("color", "current_border_color", "#12345678"),
+        ("outline_size", "current_size", 100),
+        ("face_color", "current_face_color", "#12345678"),
+        ("symbol", "current_symbol", "x"),
+        ("edge_width", "current_border_width", 0.8),
+    ],
+)
+def test_seting(viewer, config_attr, layer_attr, test_feat):
+    ctc = [cc.CellTypeConfig(**{config_attr: test_feat})]
     widget = Count3D(viewer, ctc)
     layer = widget.cell_type_gui_and_data[0].layer
-    assert layer.current_border_width == test_feat
+    assert getattr(layer, layer_attr) == test_feat
 
 
 if __name__ == "__main__":
@@ -2,34 +2,53 @@
 tests the reconstruct selected plugin
 """
 
+from functools import lru_cache
 from typing import List, Tuple
 
 import numpy as np
+import pytest
 from skimage.morphology import ball
 
 from napari_3d_counter import reconstruct_selected
 
 
-def place_ball(
-    image: np.ndarray, position: Tuple[int, int, int], number: int, radius=5
-) -> np.ndarray:
-    ball_z, ball_x, ball_y = np.where(ball(radius))
-    image[
-        ball_z + position[0], ball_x + position[1], ball_y + position[2]
-    ] = number
-    return image
+@lru_cache(maxsize=16)
+def ball_offsets(radius: int) -> np.ndarray:
+    """(3, M) array of the z, y, x offsets of each voxel in a ball"""
+    return np.stack(np.where(ball(radius)))
 
 
-def make_sample_data(points: List[Tuple[int, int, int]]) -> np.ndarray:
-    labels = np.zeros(shape=(30, 200, 200)).astype(int)
-    for i, point in enumerate(points, start=1):
-        labels = place_ball(labels, tuple(p - 5 for p in point), i)
+def make_sample_data(
+    points: List[Tuple[int, int, int]], radius=5
+) -> np.ndarray:
+    labels = np.zeros(shape=(30, 200, 200), dtype=np.uint8)
+    if not points:
+        return labels
+    offsets = ball_offsets(radius)
+    # label each ball with its 1 based index in a single scatter
+    corners = np.array(points) - radius
+    # (3, K * M) indices from broadcasting (K, 3, 1) corners with (3, M)
+    indices = (corners[:, :, np.newaxis] + offsets).swapaxes(0, 1)
+    numbers = np.repeat(np.arange(1, len(points) + 1), offsets.shape[1])
+    labels[tuple(indices.reshape(3, -1))] = numbers
     return labels
 
 
-def test_reconstruct_selected(make_napari_viewer):
-    points = [(12, 100, 30), (7, 150, 100), (10, 20, 20)]
-    labels = make_sample_data(points)
+SAMPLE_POINTS = [(12, 100, 30), (7, 150, 100), (10, 20, 20)]
+
+
+@pytest.fixture(scope="session")
+def sample_labels() -> np.ndarray:
+    """
+    labels with a ball around each of SAMPLE_POINTS
+    shared between tests, so do not modify
+    """
+    return make_sample_data(SAMPLE_POINTS)
+
+
+def test_reconstruct_selected(make_napari_viewer, sample_labels):
+    points = SAMPLE_POINTS
+    labels = sample_labels
     viewer = make_napari_viewer()
     lbls = viewer.add_labels(labels, name="lbls")
     pts = viewer.add_points(points, name="pts")
@@ -47,9 +66,8 @@ def test_reconstruct_selected_empty(make_napari_viewer):
     assert out.sum() == 0
 
 
-def test_skip_empty_points(make_napari_viewer):
-    points = [(12, 100, 30), (7, 150, 100), (10, 20, 20)]
-    labels = make_sample_data(points)
+def test_skip_empty_points(make_napari_viewer, sample_labels):
+    labels = sample_labels
     viewer = make_napari_viewer()
     lbls = viewer.add_labels(labels, name="lbls")
     points = [(0, 0, 0), (1, 1, 1)]
@@ -61,4 +79,6 @@ def test_skip_empty_points(make_napari_viewer):
 if __name__ == "__main__":
     import napari
 
-    test_skip_empty_points(napari.viewer.Viewer)
+    test_skip_empty_points(
+        napari.viewer.Viewer, make_sample_data(SAMPLE_POINTS)
+    )
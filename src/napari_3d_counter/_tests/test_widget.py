@@ -13,6 +13,15 @@ from napari_3d_counter._widget import CellTypeGuiAndData
 
 import napari
 from napari.utils.color import ColorValue
+from packaging.version import Version
+
+NAPARI_VERSION = Version(napari.__version__)
+
+# background image for tests that only need something in the viewer
+IMAGE = np.zeros((100, 100, 100), dtype=np.float32)
+POINT_111 = np.array([1, 1, 1], dtype=np.float32)
+POINT_222 = np.array([2, 2, 2], dtype=np.float32)
+POINT_121 = np.array([1, 2, 1], dtype=np.float32)
 
 
 @dataclass
@@ -28,6 +37,18 @@ def total_n_points(cell_type_gui_and_data: list[CellTypeGuiAndData]):
     return sum
 
 
+def out_of_slice_matches_layers(my_widget: Count3D) -> bool:
+    """
+    checks that the out of slice points are the points of all cell types,
+    regardless of order
+    """
+    expected = np.vstack(
+        [ct.layer.data[:, 1:] for ct in my_widget.cell_type_gui_and_data]
+    )
+    actual = my_widget.out_of_slice_points.data
+    return sorted(actual.tolist()) == sorted(expected.tolist())
+
+
 def get_gui_counter_state(cell_type: CellTypeGuiAndData) -> int:
     """
     parses the count from the widget
@@ -43,7 +64,7 @@ def get_gui_counter_state(cell_type: CellTypeGuiAndData) -> int:
 def test_change_state(make_napari_viewer):
     # make viewer and add an image layer using our fixture
     viewer = make_napari_viewer()
-    viewer.add_image(np.random.random((100, 100, 100)))
+    viewer.add_image(IMAGE)
 
     # create our widget, passing in the viewer
     my_widget = Count3D(viewer)
@@ -58,45 +79,65 @@ def test_change_color(make_napari_viewer):
     viewer = make_napari_viewer()
     my_widget = Count3D(viewer)
     default_celltype = my_widget.cell_type_gui_and_data[0]
-    my_widget.new_pointer_point(Event([np.array([1, 1, 1])]))
+    my_widget.new_pointer_point(Event([POINT_111]))
     test_color = ColorValue("#12345678")
     default_celltype.layer.current_border_color = test_color
     assert np.allclose(default_celltype.layer.border_color[0], test_color)
 
 
+def test_click_keeps_border_colors(make_napari_viewer):
+    viewer = make_napari_viewer()
+    my_widget = Count3D(viewer)
+    default_celltype = my_widget.cell_type_gui_and_data[0]
+    my_widget.new_pointer_point(Event([POINT_111]))
+    border_color_events = []
+    default_celltype.layer.events.border_color.connect(
+        border_color_events.append
+    )
+    my_widget.new_pointer_point(Event([POINT_222]))
+    # the new point already has current_border_color
+    assert border_color_events == []
+    # the click updated the button itself
+    assert not my_widget.gui_update_timer.isActive()
+    assert get_gui_counter_state(default_celltype) == 2
+
+
 def test_add_point(make_napari_viewer):
     # make viewer and add an image layer using our fixture
     viewer = make_napari_viewer()
-    viewer.add_image(np.random.random((100, 100, 100)))
+    viewer.add_image(IMAGE)
 
     # create our widget, passing in the viewer
     my_widget = Count3D(viewer)
     event = Event()
     default_celltype = my_widget.cell_type_gui_and_data[0]
-    event.value = [np.array([1, 1, 1])]
+    event.value = [POINT_111]
     my_widget.new_pointer_point(event)
     print(default_celltype.layer.data.shape)
     assert default_celltype.layer.data.shape == (1, 3)
-    event.value = [np.array([2, 2, 2])]
+    assert np.array_equal(my_widget.out_of_slice_points.data, [POINT_111[1:]])
+    event.value = [POINT_222]
     my_widget.new_pointer_point(event)
     assert default_celltype.layer.data.shape == (2, 3)
+    assert np.array_equal(
+        my_widget.out_of_slice_points.data, [POINT_111[1:], POINT_222[1:]]
+    )
 
 
 def test_gui_count_change(make_napari_viewer):
     viewer = make_napari_viewer()
-    viewer.add_image(np.random.random((100, 100, 100)))
+    viewer.add_image(IMAGE)
 
     # create our widget, passing in the viewer
     my_widget = Count3D(viewer)
     event = Event()
     default_celltype = my_widget.cell_type_gui_and_data[0]
     assert get_gui_counter_state(default_celltype) == 0
-    event.value = [np.array([1, 1, 1])]
+    event.value = [POINT_111]
     my_widget.new_pointer_point(event)
     assert get_gui_counter_state(default_celltype) == 1
 
 
-
 def test_keybind_conflict(make_napari_viewer):
     viewer = make_napari_viewer()
     config = [CellTypeConfig(keybind="q"), CellTypeConfig(keybind="q")]
@@ -108,12 +149,12 @@ def test_keybind_conflict(make_napari_viewer):
 def test_undo(make_napari_viewer):
     # make viewer and add an image layer using our fixture
     viewer = make_napari_viewer()
-    viewer.add_image(np.random.random((100, 100, 100)))
+    viewer.add_image(IMAGE)
 
     # create our widget, passing in the viewer
     my_widget = Count3D(viewer)
     event = Event()
-    event.value = [np.array([1, 1, 1])]
+    event.value = [POINT_111]
     my_widget.new_pointer_point(event)
     my_widget.undo()
     default_celltype = my_widget.cell_type_gui_and_data[0]
@@ -121,6 +162,39 @@ def test_undo(make_napari_viewer):
     assert get_gui_counter_state(default_celltype) == 0
 
 
+def test_undo_out_of_slice(make_napari_viewer):
+    viewer = make_napari_viewer()
+    my_widget = Count3D(
+        viewer, cell_type_config=[CellTypeConfig("one"), CellTypeConfig("two")]
+    )
+    one, two = my_widget.cell_type_gui_and_data
+    my_widget.new_pointer_point(Event([POINT_111]))
+    my_widget.change_state_to(two)
+    my_widget.new_pointer_point(Event([POINT_222]))
+    my_widget.change_state_to(one)
+    my_widget.new_pointer_point(Event([POINT_121]))
+    assert out_of_slice_matches_layers(my_widget)
+    for n_points in [2, 1, 0]:
+        my_widget.undo()
+        assert len(my_widget.out_of_slice_points.data) == n_points
+        assert out_of_slice_matches_layers(my_widget)
+
+
+def test_undo_out_of_slice_from_manual_add(make_napari_viewer):
+    viewer = make_napari_viewer()
+    my_widget = Count3D(
+        viewer, cell_type_config=[CellTypeConfig("one"), CellTypeConfig("two")]
+    )
+    my_widget.new_pointer_point(Event([POINT_111]))
+    # out of slice points are not updated until the Qt event loop runs, so
+    # undo does not find this point and rebuilds instead
+    viewer.layers["two"].add([1, 2, 3])
+    my_widget.undo()
+    assert out_of_slice_matches_layers(my_widget)
+    assert len(my_widget.out_of_slice_points.data) == 1
+    assert not my_widget.out_of_slice_outdated
+
+
 def test_manual_add(make_napari_viewer):
     viewer = make_napari_viewer()
     # create our widget, passing in the viewer
@@ -130,6 +204,22 @@ def test_manual_add(make_napari_viewer):
     assert len(my_widget.undo_stack) == 1
 
 
+def test_scheduled_gui_update(make_napari_viewer, qtbot):
+    viewer = make_napari_viewer()
+    my_widget = Count3D(
+        viewer, cell_type_config=[CellTypeConfig("one"), CellTypeConfig("two")]
+    )
+    cell_type = my_widget.cell_type_gui_and_data[0]
+    # manual edits update the GUI once Qt processes the timer
+    viewer.layers["one"].add([1, 2, 3])
+    qtbot.waitUntil(lambda: cell_type.button.text().startswith("[1]"))
+    assert not my_widget.out_of_slice_outdated
+    assert np.array_equal(my_widget.out_of_slice_points.data, [[2, 3]])
+    # so do renames
+    cell_type.layer.name = "renamed"
+    qtbot.waitUntil(lambda: "renamed" in cell_type.button.text())
+
+
 def test_undo_from_manual_add(make_napari_viewer):
     # make viewer and add an image layer using our fixture
     viewer = make_napari_viewer()
@@ -146,7 +236,7 @@ def test_undo_from_manual_add(make_napari_viewer):
 def test_undo_across_states_again(make_napari_viewer):
     # make viewer and add an image layer using our fixture
     viewer = make_napari_viewer()
-    viewer.add_image(np.random.random((100, 100, 100)))
+    viewer.add_image(IMAGE)
     # create our widget, passing in the viewer
     my_widget = Count3D(
         viewer,
@@ -159,7 +249,7 @@ def test_undo_across_states_again(make_napari_viewer):
         == 0
         == len(my_widget.undo_stack)
     )
-    event.value = [np.array([1, 1, 1])]
+    event.value = [POINT_111]
     my_widget.new_pointer_point(event)
     assert (
         total_n_points(my_widget.cell_type_gui_and_data)
@@ -167,7 +257,7 @@ def test_undo_across_states_again(make_napari_viewer):
         == len(my_widget.undo_stack)
     )
     my_widget.change_state_to(my_widget.cell_type_gui_and_data[1])
-    event.value = [np.array([2, 2, 2])]
+    event.value = [POINT_222]
     my_widget.new_pointer_point(event)
     assert (
         total_n_points(my_widget.cell_type_gui_and_data)
@@ -175,7 +265,7 @@ def test_undo_across_states_again(make_napari_viewer):
         == len(my_widget.undo_stack)
     )
     my_widget.change_state_to(my_widget.cell_type_gui_and_data[1])
-    event.value = [np.array([1, 1, 1])]
+    event.value = [POINT_111]
     my_widget.new_pointer_point(event)
     assert (
         total_n_points(my_widget.cell_type_gui_and_data)
@@ -183,7 +273,7 @@ def test_undo_across_states_again(make_napari_viewer):
         == len(my_widget.undo_stack)
     )
     my_widget.change_state_to(my_widget.cell_type_gui_and_data[1])
-    event.value = [np.array([2, 2, 2])]
+    event.value = [POINT_222]
     my_widget.new_pointer_point(event)
     assert (
         total_n_points(my_widget.cell_type_gui_and_data)
@@ -219,7 +309,7 @@ def test_undo_across_states_again(make_napari_viewer):
 def test_undo_across_states(make_napari_viewer):
     # make viewer and add an image layer using our fixture
     viewer = make_napari_viewer()
-    viewer.add_image(np.random.random((100, 100, 100)))
+    viewer.add_image(IMAGE)
 
     # create our widget, passing in the viewer
 
@@ -230,17 +320,17 @@ def test_undo_across_states(make_napari_viewer):
     event = Event()
     my_widget.change_state_to(my_widget.cell_type_gui_and_data[0])
     assert total_n_points(my_widget.cell_type_gui_and_data) == 0
-    event.value = [np.array([1, 1, 1])]
+    event.value = [POINT_111]
     my_widget.new_pointer_point(event)
     assert total_n_points(my_widget.cell_type_gui_and_data) == 1
     my_widget.change_state_to(my_widget.cell_type_gui_and_data[1])
-    event.value = [np.array([2, 2, 2])]
+    event.value = [POINT_222]
     my_widget.new_pointer_point(event)
     assert total_n_points(my_widget.cell_type_gui_and_data) == 2
     my_widget.change_state_to(my_widget.cell_type_gui_and_data[0])
     my_widget.new_pointer_point(event)
     assert total_n_points(my_widget.cell_type_gui_and_data) == 3
-    event.value = [np.array([2, 2, 2])]
+    event.value = [POINT_222]
     my_widget.undo()  # other state
     assert total_n_points(my_widget.cell_type_gui_and_data) == 2
     my_widget.undo()  # current state state
@@ -273,7 +363,7 @@ def test_name_counter(make_napari_viewer):
     viewer = make_napari_viewer()
     my_widget = Count3D(viewer)
     event = Event()
-    event.value = [np.array([1, 1, 1])]
+    event.value = [POINT_111]
     my_widget.new_pointer_point(event)
     default_celltype = my_widget.cell_type_gui_and_data[0]
     assert default_celltype.button.text()[1] == "1"
@@ -290,6 +380,26 @@ def test_name_counter2(make_napari_viewer):
     assert my_widget.out_of_slice_points.data.shape == (0, 2)
 
 
+def test_hidden_out_of_slice(make_napari_viewer):
+    viewer = make_napari_viewer()
+    my_widget = Count3D(
+        viewer, cell_type_config=[CellTypeConfig("one"), CellTypeConfig("two")]
+    )
+    my_widget.out_of_slice_points.visible = False
+    my_widget.new_pointer_point(Event([POINT_111]))
+    my_widget.change_state_to(my_widget.cell_type_gui_and_data[1])
+    my_widget.new_pointer_point(Event([POINT_222]))
+    # not updated while hidden
+    assert my_widget.out_of_slice_outdated
+    assert my_widget.out_of_slice_points.data.shape == (0, 2)
+    my_widget.out_of_slice_points.visible = True
+    assert not my_widget.out_of_slice_outdated
+    expected = np.vstack(
+        [ct.layer.data[:, 1:] for ct in my_widget.cell_type_gui_and_data]
+    )
+    assert np.array_equal(my_widget.out_of_slice_points.data, expected)
+
+
 def test_save_points_to_df_empty(make_napari_viewer):
     viewer = make_napari_viewer()
     my_widget = Count3D(viewer)
@@ -301,12 +411,30 @@ def test_save_points_to_df_empty(make_napari_viewer):
 def test_save_points_to_df(make_napari_viewer):
     viewer = make_napari_viewer()
     my_widget = Count3D(viewer)
-    my_widget.new_pointer_point(Event([np.array([1, 1, 1])]))
+    my_widget.new_pointer_point(Event([POINT_111]))
     my_widget.change_state_to(my_widget.cell_type_gui_and_data[1])
-    my_widget.new_pointer_point(Event([np.array([2, 2, 2])]))
+    my_widget.new_pointer_point(Event([POINT_222]))
     df = my_widget.save_points_to_df()
     assert len(df.index) == 2
     assert np.all(df.columns == np.array(["cell_type", "z", "y", "x"]))
+    assert isinstance(df["cell_type"].dtype, pd.CategoricalDtype)
+
+
+def test_load_save_loop_empty_categories(make_napari_viewer):
+    viewer = make_napari_viewer()
+    my_widget = Count3D(viewer)
+    my_widget.new_pointer_point(Event([POINT_111]))
+    df = my_widget.save_points_to_df()
+    # the other cell types are categories without points
+    assert len(df["cell_type"].cat.categories) == len(
+        my_widget.cell_type_gui_and_data
+    )
+    # load into a different widget
+    viewer = make_napari_viewer()
+    my_widget = Count3D(viewer, [CellTypeConfig(name="other")])
+    my_widget.read_points_from_df(df)
+    names = [ct.layer.name for ct in my_widget.cell_type_gui_and_data]
+    assert names == ["other", "Cell type 1"]
 
 
 def test_load_points_from_df(make_napari_viewer):
@@ -323,6 +451,29 @@ def test_load_points_from_df(make_napari_viewer):
     my_widget.read_points_from_df(df)
     print(my_widget.cell_type_gui_and_data[-1])
     assert my_widget.cell_type_gui_and_data[-1].layer.name == "2"
+    # loading into an existing empty layer is not undoable
+    undo_stack_len = len(my_widget.undo_stack)
+    df["cell_type"] = "Cell type 1"
+    my_widget.read_points_from_df(df)
+    assert len(viewer.layers["Cell type 1"].data) == 4
+    assert len(my_widget.undo_stack) == undo_stack_len
+
+
+def test_load_points_from_df_file_order(make_napari_viewer):
+    viewer = make_napari_viewer()
+    my_widget = Count3D(viewer, [CellTypeConfig("other")])
+    df = pd.DataFrame(
+        {
+            "cell_type": ["b", "b", "a", "a"],
+            "z": [1, 1, 1, 1],
+            "y": [3, 2, 1, 0],
+            "x": [0, 1, 2, 3],
+        }
+    )
+    my_widget.read_points_from_df(df)
+    # new layers are made in the order they appear in the file
+    names = [ct.layer.name for ct in my_widget.cell_type_gui_and_data]
+    assert names == ["other", "b", "a"]
 
 
 def test_load_points_from_df_overlap(make_napari_viewer):
@@ -398,7 +549,7 @@ def test_color_conflict(make_napari_viewer):
 def test_load_save_loop(make_napari_viewer):
     viewer = make_napari_viewer()
     my_widget = Count3D(viewer, [CellTypeConfig(name="test_name")])
-    my_widget.new_pointer_point(Event([np.array([1, 1, 1])]))
+    my_widget.new_pointer_point(Event([POINT_111]))
     df = my_widget.save_points_to_df()
     # load into a different widget
     viewer = make_napari_viewer()
@@ -410,11 +561,11 @@ def test_load_save_loop(make_napari_viewer):
 
 
 def test_change_symbol(make_napari_viewer):
-    if napari.__version__.split(".")[:3] == ["0", "4", "19"]:
+    if NAPARI_VERSION.release[:3] == (0, 4, 19):
         pytest.skip("changing symbol not supported in napari 0.4.19")
     viewer = make_napari_viewer()
     my_widget = Count3D(viewer, [CellTypeConfig(name="test_name")])
-    my_widget.new_pointer_point(Event([np.array([1, 2, 1])]))
+    my_widget.new_pointer_point(Event([POINT_121]))
     cell_type = my_widget.cell_type_gui_and_data[0]
     star = napari.layers.points._points_constants.Symbol.STAR
     cell_type.layer.current_symbol = star
@@ -424,7 +575,7 @@ def test_change_symbol(make_napari_viewer):
 def test_change_size(make_napari_viewer):
     viewer = make_napari_viewer()
     my_widget = Count3D(viewer, [CellTypeConfig(name="test_name")])
-    my_widget.new_pointer_point(Event([np.array([1, 2, 1])]))
+    my_widget.new_pointer_point(Event([POINT_121]))
     cell_type = my_widget.cell_type_gui_and_data[0]
     cell_type.layer.current_size = 100
     assert cell_type.layer.size[0] == 100
@@ -433,7 +584,7 @@ def test_change_size(make_napari_viewer):
 def test_change_face_color(make_napari_viewer):
     viewer = make_napari_viewer()
     my_widget = Count3D(viewer, [CellTypeConfig(name="test_name")])
-    my_widget.new_pointer_point(Event([np.array([1, 2, 1])]))
+    my_widget.new_pointer_point(Event([POINT_121]))
     cell_type = my_widget.cell_type_gui_and_data[0]
     color = "#00FF00"
     cell_type.layer.current_face_color = color
@@ -463,6 +614,3 @@ def test_change_face_color(make_napari_viewer):
 # # read captured output and check that it's as we expected
 # captured = capsys.readouterr()
 # assert captured.out == f"you have selected {layer}\n"
-
-if __name__ == "__main__":
-    test_color_conflict(napari.Viewer)
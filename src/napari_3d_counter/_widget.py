@@ -2,8 +2,9 @@
 implements the counting interface and the reconstruction plugin
 """
 
+from collections import deque
 from dataclasses import dataclass
-from functools import partial
+from functools import lru_cache, partial
 from pathlib import Path
 from typing import List, Optional, Literal
 from threading import Lock
@@ -14,8 +15,7 @@ from napari.layers import Points, Labels
 import numpy as np
 import pandas as pd
 from napari.utils.events import Event
-from napari.utils.color import ColorValue
-from qtpy.QtCore import Qt  # type: ignore
+from qtpy.QtCore import Qt, QTimer  # type: ignore
 from qtpy.QtWidgets import (  # pylint: disable=no-name-in-module
     QFileDialog,
     QFrame,
@@ -29,6 +29,7 @@ from qtpy.QtWidgets import (  # pylint: disable=no-name-in-module
 from .celltype_config import (
     CellTypeConfig,
     CellTypeConfigNotOptional,
+    parse_color,
     process_cell_type_config,
     to_hex,
 )
@@ -41,6 +42,7 @@ DEFUALT_CONFIG = [
 ]
 
 
+@lru_cache(maxsize=256)
 def get_text_color(background_color: str) -> str:
     """
     returns black or white as hex string
@@ -49,7 +51,7 @@ def get_text_color(background_color: str) -> str:
     # same function as dinstinctipy
     white = "#ffffff"
     black = "#000000"
-    red, green, blue, _ = ColorValue(background_color)
+    red, green, blue, _ = parse_color(background_color)
     text_color = (
         white if (red * 0.299 + green * 0.587 + blue * 0.114) < 0.6 else black
     )
@@ -87,6 +89,8 @@ class CellTypeGuiAndData:
     button: QPushButton
     layer: Points
     gui_lock: Lock
+    # the border color the button's style sheet was last made for
+    style_sheet_color: str = ""
 
     def update_button_gui(self):
         """
@@ -101,32 +105,41 @@ class CellTypeGuiAndData:
             f"[{self.layer.data.shape[0]}] {self.layer.name}" + keybind_str
         )
         self.button.setText(button_text)
-        color = to_hex(ColorValue(self.layer.current_border_color)[:-1])
+        # only restyle the button if the color changed
+        border_color = self.layer.current_border_color
+        if border_color == self.style_sheet_color:
+            return
+        self.style_sheet_color = border_color
+        color = to_hex(parse_color(border_color)[:-1])
         text_color = get_text_color(color)
         # hover_color is half way between text color and background color
-        hover_color_rgb = (ColorValue(text_color) + ColorValue(color))[:-1] / 2
+        summed = parse_color(text_color) + parse_color(color)
+        hover_color_rgb = summed[:-1] / 2
         style_sheet = (
             f"QPushButton{{background-color: {color}; color: {text_color};}}"
             f"QPushButton:hover{{background-color: {to_hex(hover_color_rgb)}}}"
         )
         self.button.setStyleSheet(style_sheet)
-        # updates all border_colors to current_border_color
-        current_color = ColorValue(self.layer.current_border_color)
-        n_border_colors = self.layer.border_color.shape[0]
-        if n_border_colors:
-            self.layer.border_color = np.vstack(
-                [current_color] * n_border_colors
-            )
 
     def update_attr(
-        self, attr: Literal["symbol", "size", "face_color", "border_width"]
+        self,
+        attr: Literal[
+            "symbol", "size", "face_color", "border_color", "border_width"
+        ],
     ):
         """
-        updates the size of the cell to the current size
+        updates attr of every point to the current value of attr
         """
-        current = getattr(self.layer, f"current_{attr}")
+        # do nothing if gui_lock is locked
+        # napari re-emits current values when adding a point, and the new
+        # point already has them
+        if self.gui_lock.locked():
+            return
+        current = np.asarray(getattr(self.layer, f"current_{attr}"))
         n_points = self.layer.data.shape[0]
-        setattr(self.layer, attr, np.array([current] * n_points))
+        # copy because napari layers may modify these arrays in place
+        values = np.broadcast_to(current, (n_points, *current.shape)).copy()
+        setattr(self.layer, attr, values)
 
     def get_calculated_config(
         self, out_of_slice_points_size: float
@@ -147,7 +160,7 @@ class CellTypeGuiAndData:
         return CellTypeConfig(
             name=self.layer.name,
             out_of_slice_point_size=out_of_slice_points_size,
-            color=to_hex(ColorValue(self.layer.current_border_color)),
+            color=to_hex(parse_color(self.layer.current_border_color)),
             keybind=self.keybind,
             symbol=self.layer.current_symbol.value,  # type: ignore
             outline_size=current_size,
@@ -180,9 +193,16 @@ class Count3D(QWidget):  # pylint: disable=R0902
         # viewer is needed to add layers
         self.viewer = napari_viewer
         # a stack containing points with added layers
-        self.undo_stack: List[CellTypeGuiAndData] = []
+        self.undo_stack: deque[CellTypeGuiAndData] = deque()
+        # finds the cell type from the id of its layer
+        self.cell_type_by_layer_id: dict[int, CellTypeGuiAndData] = {}
         # prevents unwanted animations
         self.gui_lock = Lock()
+        # coalesces GUI updates requested by napari events into one
+        self.gui_update_timer = QTimer(self)
+        self.gui_update_timer.setSingleShot(True)
+        self.gui_update_timer.setInterval(0)
+        self.gui_update_timer.timeout.connect(self.run_scheduled_updates)
         # add out of slice markers
         self.out_of_slice_points = self.viewer.add_points(
             ndim=2,
@@ -191,13 +211,25 @@ class Count3D(QWidget):  # pylint: disable=R0902
         )
 
         def update_out_of_slice_size():
-            current = self.out_of_slice_points.current_size
+            current = np.asarray(self.out_of_slice_points.current_size)
             n_points = self.out_of_slice_points.data.shape[0]
-            self.out_of_slice_points.size = np.array([current] * n_points)
+            self.out_of_slice_points.size = np.broadcast_to(
+                current, (n_points, *current.shape)
+            ).copy()
 
         self.out_of_slice_points.events.current_size.connect(
             update_out_of_slice_size
         )
+        # out of slice points are not updated while the layer is hidden
+        self.out_of_slice_outdated = False
+
+        def update_out_of_slice_if_outdated():
+            if self.out_of_slice_points.visible and self.out_of_slice_outdated:
+                self.update_out_of_slice()
+
+        self.out_of_slice_points.events.visible.connect(
+            update_out_of_slice_if_outdated
+        )
         # set up cell type points layers
         self.cell_type_gui_and_data = [
             self.init_celltype_gui_and_data(state)
@@ -243,14 +275,20 @@ class Count3D(QWidget):  # pylint: disable=R0902
         self.layout().addLayout(row_layout)
         # initialize state to the first default
         self.pointer_type_state = self.cell_type_gui_and_data[0]
-        self.change_state_to(self.pointer_type_state)
         self.update_gui()
 
     def update_out_of_slice(self):
         """
         Adds points from all of self.cell_type_gui_and_data
-        to self.out_of_slice_points
+        to self.out_of_slice_points. Does nothing while
+        self.out_of_slice_points is hidden, other than marking it outdated
+        so it is updated once shown
         """
+        # skip the work until the layer is shown
+        if not self.out_of_slice_points.visible:
+            self.out_of_slice_outdated = True
+            return
+        self.out_of_slice_outdated = False
         datas = [
             cell_type.layer.data[:, 1:]  # make 2d by taking last 2 coords
             for cell_type in self.cell_type_gui_and_data
@@ -260,6 +298,24 @@ class Count3D(QWidget):  # pylint: disable=R0902
         assert ndims == 2
         self.out_of_slice_points.data = data
 
+    def remove_out_of_slice_point(self, coords: np.ndarray):
+        """
+        Removes one point matching the last 2 coords from
+        self.out_of_slice_points instead of rebuilding it from all layers
+        """
+        if not self.out_of_slice_points.visible:
+            self.out_of_slice_outdated = True
+            return
+        out_of_slice = self.out_of_slice_points.data
+        (matches,) = np.nonzero((out_of_slice == coords[1:]).all(axis=1))
+        if len(matches) == 0:
+            # out of sync, so rebuild
+            self.update_out_of_slice()
+            return
+        self.out_of_slice_points.data = np.delete(
+            out_of_slice, matches[-1], axis=0
+        )
+
     def handle_data_changed(self, event: Event):
         """
         Handle adding point specific to the layer
@@ -273,19 +329,14 @@ class Count3D(QWidget):  # pylint: disable=R0902
             return
         if event.action == "added":
             return
-        # add to out_of_slice_points
-        self.update_out_of_slice()
+        # rebuild out_of_slice_points along with the GUI update
+        self.out_of_slice_outdated = True
         # figure out current cell type
-        current_points = event.source
-        current_cell_type = next(
-            cell_type
-            for cell_type in self.cell_type_gui_and_data
-            if cell_type.layer.data is current_points.data
-        )
+        current_cell_type = self.cell_type_by_layer_id[id(event.source)]
         # add to undo stack
         self.undo_stack.append(current_cell_type)
-        # update the button
-        current_cell_type.update_button_gui()
+        # update once napari is done changing the data
+        self.schedule_gui_update()
 
     def new_pointer_point(self, event: Event):
         """
@@ -302,18 +353,47 @@ class Count3D(QWidget):  # pylint: disable=R0902
         self.gui_lock.release()
         current_cell_type = self.pointer_type_state
         # dispatch point to appropriate layer
-        # implicitly calls self.handle_data_changed
-        current_point_layer = current_cell_type.layer
-        # import pudb; pudb.set_trace()
-        current_point_layer.add(coords=pointer_coords)
-        # hack to unselect last added point
         # prevent layer specific handlers from updating
-        # add and remove point
+        # the bookkeeping for this one point is done below
+        current_point_layer = current_cell_type.layer
         assert self.gui_lock.acquire(blocking=False)
         current_point_layer.add(coords=pointer_coords)
-        current_point_layer.remove_selected()
+        # unselect the added point
+        current_point_layer.selected_data = set()
         self.gui_lock.release()
-        self.update_out_of_slice()
+        # add to undo stack
+        self.undo_stack.append(current_cell_type)
+        # update the button
+        current_cell_type.update_button_gui()
+        # append to out_of_slice_points rather than rebuilding from all layers
+        if not self.out_of_slice_points.visible:
+            self.out_of_slice_outdated = True
+            return
+        new_out_of_slice = np.atleast_2d(pointer_coords)[:, 1:]
+        self.out_of_slice_points.data = np.vstack(
+            [self.out_of_slice_points.data, new_out_of_slice]
+        )
+
+    def schedule_gui_update(self, *args, **kwargs):
+        """
+        Updates the GUI once control returns to the Qt event loop, so that
+        bursts of napari events cause a single update
+        """
+        # handler for napari events
+        _ = args
+        _ = kwargs
+        # changes made under gui_lock update the GUI themselves
+        if self.gui_lock.locked():
+            return
+        self.gui_update_timer.start()
+
+    def run_scheduled_updates(self):
+        """
+        Rebuilds out of slice points if they are outdated, and updates the GUI
+        """
+        if self.out_of_slice_outdated:
+            self.update_out_of_slice()
+        self.update_gui()
 
     def update_gui(self):
         """
@@ -351,6 +431,7 @@ class Count3D(QWidget):  # pylint: disable=R0902
             layer=point_layer,
             gui_lock=self.gui_lock,
         )
+        self.cell_type_by_layer_id[id(point_layer)] = out
         # set up event handler that changes state to this
         change_state_fun = NamedPartial(
             partial(self.change_state_to, out), config.name
@@ -365,10 +446,16 @@ class Count3D(QWidget):  # pylint: disable=R0902
                 out.keybind = ""
         btn.clicked.connect(change_state_fun)
         # update GUI when name changes
-        point_layer.events.name.connect(self.update_gui)
+        point_layer.events.name.connect(self.schedule_gui_update)
         # update GUI when color changes
-        point_layer.events.current_border_color.connect(self.update_gui)
-        # Update rest of the points when face_color, size, symbol, border_width changes
+        point_layer.events.current_border_color.connect(
+            self.schedule_gui_update
+        )
+        # Update rest of the points when face_color, size, symbol, border_color,
+        # border_width changes
+        point_layer.events.current_border_color.connect(
+            partial(out.update_attr, "border_color")
+        )
         point_layer.events.current_face_color.connect(
             partial(out.update_attr, "face_color")
         )
@@ -402,6 +489,9 @@ class Count3D(QWidget):  # pylint: disable=R0902
         # handler for qt events
         _ = args
         _ = kwargs
+        if state is self.pointer_type_state:
+            # label is already up to date
+            return
         self.pointer_type_state = state
         # no need to update the whole GUI
         self.update_pointer_state_label()
@@ -413,14 +503,15 @@ class Count3D(QWidget):  # pylint: disable=R0902
         self.pointer_type_state_label.setText(
             self.pointer_type_state.layer.name
         )
-        color = to_hex(
-            ColorValue(self.pointer_type_state.layer.current_border_color)[:-1]
-        )
+        border_color = self.pointer_type_state.layer.current_border_color
+        color = to_hex(parse_color(border_color)[:-1])
         text_color = get_text_color(color)
         style_sheet = (
             f"background-color: {color}; color: {text_color}; font-size: 20px"
         )
-        self.pointer_type_state_label.setStyleSheet(style_sheet)
+        # setting a style sheet makes Qt reparse it, even if it is the same
+        if style_sheet != self.pointer_type_state_label.styleSheet():
+            self.pointer_type_state_label.setStyleSheet(style_sheet)
 
     def undo(self, *args, **kwargs):
         """
@@ -434,10 +525,15 @@ class Count3D(QWidget):  # pylint: disable=R0902
             return
         cell_type = self.undo_stack.pop()
         point_layer = cell_type.layer
+        removed = point_layer.data[-1:]
         assert self.gui_lock.acquire(blocking=True)
         point_layer.data = point_layer.data[:-1]
         self.gui_lock.release()
-        self.update_out_of_slice()
+        if len(removed):
+            self.remove_out_of_slice_point(removed[0])
+        else:
+            # the layer was already emptied
+            self.update_out_of_slice()
         # update button
         cell_type.update_button_gui()
 
@@ -523,22 +619,31 @@ class Count3D(QWidget):  # pylint: disable=R0902
             options=options,
         )
         if file_name:
-            data = pd.read_csv(file_name)
+            data = pd.read_csv(
+                file_name,
+                dtype={"cell_type": str, "z": float, "y": float, "x": float},
+            )
             self.read_points_from_df(data)
 
     def save_points_to_df(self) -> pd.DataFrame:
         """
         Saves all points a data frame with the columns
-            cell_type("str"), z(float), x(float), y(float)
+            cell_type(category), z(float), x(float), y(float)
         """
-        partial_dfs: List[pd.DataFrame] = []
-        for cell_type in self.cell_type_gui_and_data:
-            partial_df = pd.DataFrame(
-                cell_type.layer.data, columns=["z", "y", "x"]
-            )
-            partial_df.insert(0, "cell_type", cell_type.layer.name)
-            partial_dfs.append(partial_df)
-        out = pd.concat(partial_dfs)
+        cell_types = self.cell_type_gui_and_data
+        out = pd.DataFrame(
+            np.vstack([ct.layer.data for ct in cell_types]),
+            columns=["z", "y", "x"],
+        )
+        n_points = [len(ct.layer.data) for ct in cell_types]
+        codes = np.repeat(np.arange(len(cell_types)), n_points)
+        out.insert(
+            0,
+            "cell_type",
+            pd.Categorical.from_codes(
+                codes, categories=[ct.layer.name for ct in cell_types]
+            ),
+        )
         return out
 
     def read_points_from_df(self, data: pd.DataFrame):
@@ -546,23 +651,34 @@ class Count3D(QWidget):  # pylint: disable=R0902
         reads all points a data frame with the columns
             cell_type("str"), z(float), x(float), y(float)
         """
-        layer_names = np.unique(data["cell_type"])
+        points_by_name = {
+            name: points[["z", "y", "x"]]
+            for name, points in data.groupby(
+                "cell_type", observed=True, sort=False
+            )
+        }
         # if layer name is used and empty move over the data to that one
         layers = {
             ct.layer.name: ct.layer for ct in self.cell_type_gui_and_data
         }
-        duplicate_layers = layer_names[
-            np.isin(layer_names, list(layers.keys()))
-        ]
-        for layer_name in duplicate_layers:
-            if len(layers[layer_name].data) == 0:
-                # remove that layer from layer_names to add
-                layer_names = layer_names[layer_names != layer_name]
+        empty_layer_names = {
+            name
+            for name in points_by_name.keys() & layers.keys()
+            if len(layers[name].data) == 0
+        }
+        # prevent layer specific handlers from updating for each layer
+        # out of slice points and buttons are updated once at the end
+        assert self.gui_lock.acquire(blocking=False)
+        try:
+            for layer_name in empty_layer_names:
                 # tranfer the layer over
-                points = data.loc[
-                    data["cell_type"] == layer_name, ["z", "y", "x"]
-                ]
-                layers[layer_name].data = points
+                layers[layer_name].data = points_by_name[layer_name]
+        finally:
+            self.gui_lock.release()
+        # the rest need new layers
+        layer_names = [
+            name for name in points_by_name if name not in empty_layer_names
+        ]
         self.initial_config = process_cell_type_config(
             [
                 ct.get_calculated_config(self.out_of_slice_points.current_size)
@@ -573,8 +689,9 @@ class Count3D(QWidget):  # pylint: disable=R0902
         for config, layer_name in zip(
             self.initial_config[-len(layer_names) :], layer_names
         ):
-            points = data.loc[data["cell_type"] == layer_name, ["z", "y", "x"]]
-            cell_type = self.init_celltype_gui_and_data(config, data=points)
+            cell_type = self.init_celltype_gui_and_data(
+                config, data=points_by_name[layer_name]
+            )
             self.cell_type_gui_and_data.append(cell_type)
             # put button right below the last one
             layout_index = self.layout().indexOf(
@@ -597,16 +714,15 @@ def reconstruct_selected(
     Reconstructs the layers in an image
     """
     name = point_layer.name
-    reconstruction_data = np.zeros(labels_layer.data.shape).astype(np.int8)
-    for point in point_layer.data:
-        xcoord, ycoord, zcoord = point.astype(int)
-        neuron_label = labels_layer.data[xcoord, ycoord, zcoord]
-        if neuron_label == 0:
-            print(
-                f"skipping a point outside a lable at {[xcoord, ycoord, zcoord]}"
-            )
-            continue
-        reconstruction_data[labels_layer.data == neuron_label] = 1
+    labels = labels_layer.data
+    coords = point_layer.data.astype(int)
+    # look up the label under every point at once
+    point_labels = labels[tuple(coords.T)]
+    for coord in coords[point_labels == 0]:
+        print(f"skipping a point outside a lable at {coord.tolist()}")
+    selected_labels = np.unique(point_labels[point_labels != 0])
+    # a single pass over the labels for all selected neurons
+    reconstruction_data = np.isin(labels, selected_labels).astype(np.int8)
     viewer.add_image(
         reconstruction_data,
         name=f"{name} reconstruction",
@@ -3,6 +3,8 @@ Contains code for specifying style: keyboard shortcut, color, name
 """
 
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain, repeat
 from typing import List, Optional, Tuple, Union
 import numpy as np
 
@@ -21,6 +23,17 @@ def to_hex(color: np.ndarray) -> str:
     return "#" + "".join(f"{int(c * 255):02x}" for c in color)
 
 
+@lru_cache(maxsize=256)
+def parse_color(color: str) -> np.ndarray:
+    """
+    converts a color string to a read only rgba array
+    cached because the GUI parses the same few colors on every update
+    """
+    rgba = np.asarray(ColorValue(color))
+    rgba.setflags(write=False)
+    return rgba
+
+
 DEFAULT_KEYMAP_SEQUENCE = ["q", "w", "e", "r", "t", "y", ""]
 DEFAULT_COLOR_SEQUENCE = [
     "#ffff00ff",  # y
@@ -96,15 +109,12 @@ def fill_in_defaults(
     # discard used defaults
     default_list = [d for d in defaults if d not in used_defaults]
     # ensure that we will never run out of defauts
-    default_list = default_list + ([default_list[-1]] * len(requests))
+    default_iter = chain(default_list, repeat(default_list[-1]))
     # fill in Nones with a next unique default
-    out: List[str] = []
-    for request in requests:
-        if request is None:
-            out.append(default_list.pop(0))
-        else:
-            out.append(request)
-    return out
+    return [
+        next(default_iter) if request is None else request
+        for request in requests
+    ]
 
 
 def resolve_color(color: MatplotlibColor) -> str:
@@ -141,14 +151,15 @@ def process_cell_type_config(
             names.append(cell_type_config.name)
     # prevent name conflicts:
     unique_names: list[str] = []
+    used_names: set[str] = set()
     for name in names:
-        if name not in unique_names:
-            unique_names.append(name)
-            continue
-        name_int = 1
-        while f"{name} [{name_int}]" in unique_names:
-            name_int += 1
-        unique_names.append(f"{name} [{name_int}]")
+        if name in used_names:
+            name_int = 1
+            while f"{name} [{name_int}]" in used_names:
+                name_int += 1
+            name = f"{name} [{name_int}]"
+        unique_names.append(name)
+        used_names.add(name)
     outline_sizes = [
         DEFAULT_OUTLINE_SIZE if c.outline_size is None else c.outline_size
         for c in cell_type_configs